@@ -1,11 +1,13 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
 
 class WeatherRequest(BaseModel):
     query: str
     user_id: Optional[str] = None
 
 class WeatherDay(BaseModel):
+    model_config = ConfigDict(frozen=True, extra='forbid')
+
     date: str
     max_temp: float
     min_temp: float
@@ -25,7 +27,3 @@ class ErrorResponse(BaseModel):
     success: bool
     error: str
     details: Optional[str] = None
-
-
-class ToolSchema(BaseModel):
-    parameters: Dict[str, Any]
@@ -1,5 +1,4 @@
 from typing import Callable, Dict, Any
-from .models import ToolSchema
 
 
 class MCPTool:
@@ -12,10 +11,4 @@ class MCPTool:
 
     async def execute(self, **kwargs) -> Any:
         """Execute the tool with the provided arguments."""
-        # Validate input against schema if provided
-        if self.input_schema:
-            try:
-                ToolSchema(parameters=kwargs)
-            except ValueError as e:
-                raise ValueError(f"Invalid input for tool {self.name}: {str(e)}")
         return await self.method(**kwargs)
\ No newline at end of file
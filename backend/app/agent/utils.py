@@ -1,14 +1,48 @@
 import re
 import datetime
+from functools import lru_cache
 from dateutil import parser as date_parser
 from dateutil.relativedelta import relativedelta
 
+# Shared dateutil parser so the fuzzy fallback doesn't rebuild parserinfo per call
+_DATEUTIL = date_parser.parser()
+
+_ISO_DATE = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+
+# Regex-based relative date expressions, compiled once at import time
+_PATTERNS = [(re.compile(pattern), func) for pattern, func in [
+    (r'in (\d+) days?', lambda m, ref: ref + datetime.timedelta(days=int(m.group(1)))),
+    (r'(\d+) days? ago', lambda m, ref: ref - datetime.timedelta(days=int(m.group(1)))),
+    (r'next week', lambda m, ref: ref + datetime.timedelta(weeks=1)),
+    (r'last week', lambda m, ref: ref - datetime.timedelta(weeks=1)),
+    (r'next month', lambda m, ref: ref + relativedelta(months=1)),
+    (r'last month', lambda m, ref: ref - relativedelta(months=1)),
+    (r'this week', lambda m, ref: ref + datetime.timedelta(days=(6 - ref.weekday()))),
+    (r'last monday', lambda m, ref: ref - datetime.timedelta(days=ref.weekday() + 7)),
+    (r'last sunday', lambda m, ref: ref - datetime.timedelta(days=ref.weekday() + 1)),
+]]
+
+
 def resolve_relative_date(expr: str, reference_date: datetime.date = None) -> str:
     """Convert relative date expressions (from LLM) to ISO format."""
     if reference_date is None:
         reference_date = datetime.date.today()
 
-    expr = expr.lower().strip()
+    return _resolve_cached(expr.lower().strip(), reference_date.isoformat())
+
+
+@lru_cache(maxsize=512)
+def _resolve_cached(expr: str, ref_iso: str) -> str:
+    """Resolve a normalized expression against an ISO reference date (memoized)."""
+    reference_date = datetime.date.fromisoformat(ref_iso)
+
+    # Fast path: already an ISO date (common LLM output), skip the fuzzy parser
+    match = _ISO_DATE.fullmatch(expr)
+    if match:
+        try:
+            return datetime.date(int(match[1]), int(match[2]), int(match[3])).isoformat()
+        except ValueError:
+            pass
 
     # Basic expressions
     if expr == "today" or expr == "now":
@@ -19,26 +53,14 @@ def resolve_relative_date(expr: str, reference_date: datetime.date = None) -> st
         return (reference_date - datetime.timedelta(days=1)).isoformat()
 
     # Regex-based relative date expressions
-    patterns = [
-        (r'in (\d+) days?', lambda m: reference_date + datetime.timedelta(days=int(m.group(1)))),
-        (r'(\d+) days? ago', lambda m: reference_date - datetime.timedelta(days=int(m.group(1)))),
-        (r'next week', lambda m: reference_date + datetime.timedelta(weeks=1)),
-        (r'last week', lambda m: reference_date - datetime.timedelta(weeks=1)),
-        (r'next month', lambda m: reference_date + relativedelta(months=1)),
-        (r'last month', lambda m: reference_date - relativedelta(months=1)),
-        (r'this week', lambda m: reference_date + datetime.timedelta(days=(6 - reference_date.weekday()))),
-        (r'last monday', lambda m: reference_date - datetime.timedelta(days=reference_date.weekday() + 7)),
-        (r'last sunday', lambda m: reference_date - datetime.timedelta(days=reference_date.weekday() + 1)),
-    ]
-
-    for pattern, func in patterns:
-        match = re.fullmatch(pattern, expr)
+    for pattern, func in _PATTERNS:
+        match = pattern.fullmatch(expr)
         if match:
-            return func(match).isoformat()
+            return func(match, reference_date).isoformat()
 
     # Final fallback: use fuzzy parser (if date was something like "August 3rd")
     try:
-        parsed = date_parser.parse(expr, fuzzy=True, default=datetime.datetime.combine(reference_date, datetime.time()))
+        parsed = _DATEUTIL.parse(expr, fuzzy=True, default=datetime.datetime.combine(reference_date, datetime.time()))
         return parsed.date().isoformat()
     except Exception:
         return reference_date.isoformat()
@@ -1,8 +1,16 @@
+import asyncio
+import hashlib
 import logging
-import requests
+import os
+import httpx
 import json
+import orjson
 import re
-from typing import Dict, List, Tuple
+import tempfile
+from cachetools import TTLCache
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from fastapi import HTTPException
 from datetime import date
 from .models import WeatherDay, WeatherResponse
@@ -14,15 +22,58 @@ logger = logging.getLogger(__name__)
 GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
 NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
 WEATHER_API_URL = "https://api.open-meteo.com/v1/forecast"
+GROQ_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+CACHE_DIR = Path(os.getenv("WEATHER_AGENT_CACHE_DIR", "~/.cache/weather_agent")).expanduser()
+GEO_CACHE_MAXSIZE = 4096
+LLM_CACHE_MAXSIZE = 4096
+WEATHER_CACHE_MAXSIZE = 10_000
+WEATHER_CACHE_TTL = 900  # seconds
+
+_JSON_BLOCK_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    """Write a file through a unique temp file and a rename, so readers never see partial content."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
 
 class WeatherAgent:
     """Weather Agent class that handles weather forecast requests using natural language processing."""
     
-    def __init__(self, groq_api_key: str):
+    def __init__(self, groq_api_key: str, http_client: httpx.AsyncClient, llm_summary: bool = True):
         self.groq_api_key = groq_api_key
+        self.http = http_client
+        # Set to False to skip the second LLM round-trip and return a short local header instead
+        self.llm_summary = llm_summary
         self.groq_url = GROQ_URL
         self.nominatim_url = NOMINATIM_URL
         self.weather_api_url = WEATHER_API_URL
+
+        # Geocoding cache (LRU, persisted to disk) keyed by normalized place name
+        self._geo_cache_path = CACHE_DIR / "geo.json"
+        self._geo_cache: "OrderedDict[str, Tuple[float, float]]" = self._load_geo_cache()
+        self._geo_lock = asyncio.Lock()
+        self._geo_save_lock = asyncio.Lock()
+
+        # Forecast cache keyed by coordinates rounded to ~1 km and the date range
+        self._weather_cache: TTLCache = TTLCache(maxsize=WEATHER_CACHE_MAXSIZE, ttl=WEATHER_CACHE_TTL)
+        self._weather_lock = asyncio.Lock()
+
+        # LLM extraction cache keyed by (day, normalized query), persisted as JSON lines
+        self._llm_cache_path = CACHE_DIR / "llm.jsonl"
+        self._llm_cache_day = date.today()
+        self._llm_cache_lines = 0  # lines currently in llm.jsonl, to know when to compact it
+        self._llm_cache: "OrderedDict[str, Tuple[str, str, str]]" = self._load_llm_cache()
+        self._llm_save_lock = asyncio.Lock()
         
         # Define tools with method references and input schemas
         self.tools = [
@@ -45,40 +96,165 @@ class WeatherAgent:
                 input_schema={"user_question": {"type": "string"}}
             )
         ]
+        self.tools_by_name: Dict[str, MCPTool] = {tool.name: tool for tool in self.tools}
         
         logger.info("WeatherAgent initialized successfully with %d tools", len(self.tools))
 
+    def _load_geo_cache(self) -> "OrderedDict[str, Tuple[float, float]]":
+        """Load persisted geocoding results from disk, if any."""
+        try:
+            with open(self._geo_cache_path, encoding="utf-8") as f:
+                entries = json.load(f)
+            cache = OrderedDict((key, (float(lat), float(lon))) for key, (lat, lon) in entries.items())
+            while len(cache) > GEO_CACHE_MAXSIZE:
+                cache.popitem(last=False)
+            return cache
+        except FileNotFoundError:
+            return OrderedDict()
+        except Exception as e:
+            logger.warning("⚠️ Ignoring unreadable geocoding cache: %s", e)
+            return OrderedDict()
+
+    async def _save_geo_cache(self) -> None:
+        """Persist the geocoding cache to disk off the event loop."""
+        # Saves run one at a time so an older snapshot can never overwrite a newer one
+        async with self._geo_save_lock:
+            async with self._geo_lock:
+                snapshot = dict(self._geo_cache)
+            try:
+                await asyncio.to_thread(lambda: _write_atomic(self._geo_cache_path, json.dumps(snapshot)))
+            except Exception as e:
+                logger.warning("⚠️ Failed to persist geocoding cache: %s", e)
+
+    def _load_llm_cache(self) -> "OrderedDict[str, Tuple[str, str, str]]":
+        """Load today's persisted LLM extractions, dropping entries from earlier days."""
+        cache = OrderedDict()
+        lines = 0
+        today = self._llm_cache_day.isoformat()
+        try:
+            with open(self._llm_cache_path, encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("d") == today:
+                        cache[entry["k"]] = tuple(entry["v"])
+                        cache.move_to_end(entry["k"])
+        except FileNotFoundError:
+            return cache
+        except Exception as e:
+            logger.warning("⚠️ Ignoring unreadable LLM cache: %s", e)
+            return cache
+
+        while len(cache) > LLM_CACHE_MAXSIZE:
+            cache.popitem(last=False)
+        self._llm_cache_lines = lines
+        if lines > len(cache):
+            # Compact the file so it only holds entries that can still be hit
+            try:
+                self._compact_llm_cache_file(today, list(cache.items()))
+            except Exception as e:
+                logger.warning("⚠️ Failed to compact LLM cache: %s", e)
+        return cache
+
+    def _compact_llm_cache_file(self, day: str, entries: List[Tuple[str, Tuple[str, str, str]]]) -> None:
+        """Rewrite llm.jsonl so it holds exactly the given entries."""
+        _write_atomic(self._llm_cache_path, "".join(
+            json.dumps({"d": day, "k": key, "v": list(value)}) + "\n" for key, value in entries
+        ))
+        self._llm_cache_lines = len(entries)
+
+    def _append_llm_cache_file(self, day: str, key: str, value: Tuple[str, str, str]) -> None:
+        """Append one entry to llm.jsonl."""
+        self._llm_cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._llm_cache_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"d": day, "k": key, "v": list(value)}) + "\n")
+        self._llm_cache_lines += 1
+
+    async def _roll_llm_cache(self, today: date) -> None:
+        """Start a fresh LLM cache when the day changes; earlier keys can no longer be hit."""
+        self._llm_cache.clear()
+        self._llm_cache_day = today
+        async with self._llm_save_lock:
+            try:
+                await asyncio.to_thread(self._compact_llm_cache_file, today.isoformat(), [])
+            except Exception as e:
+                logger.warning("⚠️ Failed to compact LLM cache: %s", e)
+
+    async def _store_llm_cache(self, key: str, value: Tuple[str, str, str]) -> None:
+        """Remember an LLM extraction in the bounded LRU and persist it off the event loop."""
+        self._llm_cache[key] = value
+        self._llm_cache.move_to_end(key)
+        while len(self._llm_cache) > LLM_CACHE_MAXSIZE:
+            self._llm_cache.popitem(last=False)
+
+        day = self._llm_cache_day.isoformat()
+        async with self._llm_save_lock:
+            try:
+                if self._llm_cache_lines >= 2 * LLM_CACHE_MAXSIZE:
+                    # The append-only log has outgrown the in-memory LRU; rewrite it from memory
+                    await asyncio.to_thread(self._compact_llm_cache_file, day, list(self._llm_cache.items()))
+                else:
+                    await asyncio.to_thread(self._append_llm_cache_file, day, key, value)
+            except Exception as e:
+                logger.warning("⚠️ Failed to persist LLM cache entry: %s", e)
+
     async def get_coordinates(self, place: str) -> Tuple[float, float]:
         """Get latitude and longitude coordinates for a given place."""
-        logger.info(f"📍 Getting coordinates for: {place}")
+        logger.info("📍 Getting coordinates for: %s", place)
+
+        cache_key = place.strip().casefold()
+        async with self._geo_lock:
+            cached = self._geo_cache.get(cache_key)
+            if cached is not None:
+                self._geo_cache.move_to_end(cache_key)
+                logger.info("✅ Coordinates cache hit: lat=%s, lon=%s", cached[0], cached[1])
+                return cached
         
         try:
-            response = requests.get(self.nominatim_url, params={
+            response = await self.http.get(self.nominatim_url, params={
                 "q": place,
                 "format": "jsonv2"
             }, headers={
                 "User-Agent": "WeatherAgent/1.0 (fastapi-mcp@example.com)"
             }, timeout=50)
 
-            if response.status_code == 200 and response.json():
-                data = response.json()[0]
+            results = orjson.loads(response.content) if response.status_code == 200 else None
+            if results:
+                data = results[0]
                 lat = float(data['lat'])
                 lon = float(data['lon'])
-                logger.info(f"✅ Coordinates found: lat={lat}, lon={lon}")
-                return lat, lon
+                logger.info("✅ Coordinates found: lat=%s, lon=%s", lat, lon)
             else:
                 raise Exception(f"No coordinates found for {place}")
                 
         except Exception as e:
-            logger.error(f"❌ Error getting coordinates: {str(e)}")
+            logger.error("❌ Error getting coordinates: %s", e)
             raise HTTPException(status_code=400, detail=f"Could not find coordinates for {place}")
 
+        async with self._geo_lock:
+            self._geo_cache[cache_key] = (lat, lon)
+            self._geo_cache.move_to_end(cache_key)
+            while len(self._geo_cache) > GEO_CACHE_MAXSIZE:
+                self._geo_cache.popitem(last=False)
+        await self._save_geo_cache()
+        return lat, lon
+
     async def get_weather_data(self, lat: float, lon: float, start_date: str, end_date: str) -> List[WeatherDay]:
         """Fetch weather data from Open-Meteo API."""
-        logger.info(f"🌍 Fetching weather for {start_date} to {end_date} at coordinates: lat={lat}, lon={lon}")
+        logger.info("🌍 Fetching weather for %s to %s at coordinates: lat=%s, lon=%s", start_date, end_date, lat, lon)
+
+        cache_key = (round(lat, 2), round(lon, 2), start_date, end_date)
+        async with self._weather_lock:
+            cached = self._weather_cache.get(cache_key)
+        if cached is not None:
+            logger.info("✅ Weather forecast served from cache")
+            return cached
         
         try:
-            response = requests.get(self.weather_api_url, params={
+            response = await self.http.get(self.weather_api_url, params={
                 "latitude": lat,
                 "longitude": lon,
                 "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum,windspeed_10m_max",
@@ -88,61 +264,163 @@ class WeatherAgent:
             }, timeout=50)
 
             if response.status_code == 200:
-                data = response.json()["daily"]
+                data = orjson.loads(response.content)["daily"]
                 
-                weather_days = []
-                dates = data.get("time", [])
-                
-                for i in range(len(dates)):
-                    weather_day = WeatherDay(
-                        date=dates[i],
-                        max_temp=data['temperature_2m_max'][i],
-                        min_temp=data['temperature_2m_min'][i],
-                        precipitation=data['precipitation_sum'][i],
-                        wind_speed=data['windspeed_10m_max'][i]
-                    )
-                    weather_days.append(weather_day)
+                rows = list(zip(
+                    data.get("time", []),
+                    data['temperature_2m_max'],
+                    data['temperature_2m_min'],
+                    data['precipitation_sum'],
+                    data['windspeed_10m_max']
+                ))
+                # Open-Meteo returns null for days it has no data for; reject those like validation would
+                if any(None in row for row in rows):
+                    raise Exception("Weather API returned missing values")
+
+                # Payload shape is fixed by Open-Meteo and nulls are ruled out, so skip per-field validation
+                weather_days = [
+                    WeatherDay.model_construct(date=d, max_temp=tx, min_temp=tn, precipitation=p, wind_speed=w)
+                    for d, tx, tn, p, w in rows
+                ]
                 
+                async with self._weather_lock:
+                    self._weather_cache[cache_key] = weather_days
                 logger.info("✅ Weather forecast retrieved successfully")
                 return weather_days
             else:
                 raise Exception(f"Weather API error: {response.status_code}")
                 
         except Exception as e:
-            logger.error(f"❌ Weather API error: {str(e)}")
+            logger.error("❌ Weather API error: %s", e)
             raise HTTPException(status_code=500, detail="Failed to fetch weather data")
 
+    def _build_groq_request(self, messages: List[Dict[str, str]], max_tokens: int = 2048,
+                            stream: bool = False) -> httpx.Request:
+        """Build the Groq chat-completion request shared by the plain and streaming calls."""
+        payload = {
+            "model": GROQ_MODEL,
+            "messages": messages,
+            "temperature": 0.1,
+            "max_tokens": max_tokens
+        }
+        if stream:
+            payload["stream"] = True
+        return self.http.build_request("POST", self.groq_url, headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.groq_api_key}"
+        }, content=orjson.dumps(payload), timeout=60)
+
     async def query_groq_llm(self, messages: List[Dict[str, str]]) -> str:
         """Send request to Groq LLM and get response."""
         logger.info("🤖 Sending request to Groq LLM")
         
         try:
-            response = requests.post(self.groq_url, headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.groq_api_key}"
-            }, json={
-                "model": "meta-llama/llama-4-scout-17b-16e-instruct",
-                "messages": messages,
-                "temperature": 0.1,
-                "max_tokens": 2048
-            }, timeout=60)
+            response = await self.http.send(self._build_groq_request(messages))
 
             if response.status_code == 200:
-                content = response.json()['choices'][0]['message']['content']
+                content = orjson.loads(response.content)['choices'][0]['message']['content']
                 logger.info("✅ LLM Response received")
                 return content
             else:
                 raise Exception(f"GROQ API error: {response.status_code} - {response.text}")
                 
         except Exception as e:
-            logger.error(f"❌ GROQ LLM error: {str(e)}")
+            logger.error("❌ GROQ LLM error: %s", e)
+            raise HTTPException(status_code=500, detail="Failed to process with LLM")
+
+    async def query_groq_llm_stream(self, messages: List[Dict[str, str]], stop_on_json: bool = False,
+                                    max_tokens: int = 2048) -> str:
+        """Stream a Groq completion; with stop_on_json, return as soon as the first JSON object closes."""
+        logger.info("🤖 Streaming request to Groq LLM")
+
+        try:
+            response = await self.http.send(self._build_groq_request(messages, max_tokens, stream=True), stream=True)
+            try:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise Exception(f"GROQ API error: {response.status_code} - {response.text}")
+
+                parts = []
+                depth = 0
+                in_string = escaped = done = False
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[len("data:"):].strip()
+                    if payload == "[DONE]":
+                        break
+                    delta = orjson.loads(payload)['choices'][0]['delta'].get('content') or ""
+                    parts.append(delta)
+                    if not stop_on_json:
+                        continue
+
+                    # Track brace depth (ignoring braces inside JSON strings) to spot the closing '}'
+                    for i, ch in enumerate(delta):
+                        if in_string:
+                            if escaped:
+                                escaped = False
+                            elif ch == "\\":
+                                escaped = True
+                            elif ch == '"':
+                                in_string = False
+                        elif ch == '"' and depth:
+                            in_string = True
+                        elif ch == "{":
+                            depth += 1
+                        elif ch == "}" and depth:
+                            depth -= 1
+                            if not depth:
+                                parts[-1] = delta[:i + 1]
+                                done = True
+                                break
+                    if done:
+                        break
+            finally:
+                # Closing the response aborts the stream early once the JSON object is complete
+                await response.aclose()
+
+            logger.info("✅ LLM Response received")
+            return "".join(parts)
+
+        except Exception as e:
+            logger.error("❌ GROQ LLM error: %s", e)
             raise HTTPException(status_code=500, detail="Failed to process with LLM")
 
     async def extract_place_and_date(self, user_question: str) -> Tuple[str, str, str]:
         """Extract location and date range from user question using LLM."""
+        today = date.today()
+        if today != self._llm_cache_day:
+            await self._roll_llm_cache(today)
+
+        cache_key = hashlib.blake2b(f"{today.isoformat()}|{user_question.strip().casefold()}".encode()).hexdigest()
+        extracted = self._llm_cache.get(cache_key)
+        if extracted is not None:
+            self._llm_cache.move_to_end(cache_key)
+            logger.info("🧠 Using cached extraction: %s", extracted)
+        else:
+            extracted = await self._extract_expressions(user_question, today)
+            if extracted is None:
+                return "", "", ""
+            await self._store_llm_cache(cache_key, extracted)
+
+        place, start_expr, end_expr = extracted
+        if start_expr == end_expr:
+            start_date = end_date = resolve_relative_date(start_expr)
+        else:
+            start_date = resolve_relative_date(start_expr)
+            end_date = resolve_relative_date(end_expr)
+        
+        # ISO date strings sort the same way as the dates they represent
+        if start_date > end_date:
+            start_date, end_date = end_date, start_date
+        
+        logger.info("📅 Resolved dates: %s to %s", start_date, end_date)
+        return place, start_date, end_date
+
+    async def _extract_expressions(self, user_question: str, today: date) -> Optional[Tuple[str, str, str]]:
+        """Ask the LLM for the place and raw date expressions; None if the reply is unusable."""
         logger.info("🧠 Extracting location and date expressions using LLM")
 
-        today = date.today()
         messages = [
             {"role": "system", "content": (
                 f"You are a date and location extraction assistant. Today's date is {today}. "
@@ -175,14 +453,15 @@ class WeatherAgent:
         ]
 
         try:
-            reply = await self.query_groq_llm(messages)
-            logger.info(f"📤 LLM extracted: {reply}")
+            # The reply is a tiny JSON object, so stop streaming as soon as it is complete
+            reply = await self.query_groq_llm_stream(messages, stop_on_json=True, max_tokens=128)
+            logger.info("📤 LLM extracted: %s", reply)
 
-            json_match = re.search(r'\{.*\}', reply, re.DOTALL)
+            json_match = _JSON_BLOCK_RE.search(reply)
             if json_match:
-                data = json.loads(json_match.group())
+                data = orjson.loads(json_match.group())
             else:
-                data = json.loads(reply)
+                data = orjson.loads(reply)
             
             place = data.get("place")
             start_expr = data.get("start_date_expr", "today")
@@ -192,17 +471,10 @@ class WeatherAgent:
                 raise ValueError("No place extracted")
                 
         except Exception as e:
-            logger.warning(f"⚠️ Failed to parse LLM response: {e}")
-            return "", "", ""
-        
-        start_date = resolve_relative_date(start_expr)
-        end_date = resolve_relative_date(end_expr)
-        
-        if start_date > end_date:
-            start_date, end_date = end_date, start_date
-        
-        logger.info(f"📅 Resolved dates: {start_date} to {end_date}")
-        return place, start_date, end_date
+            logger.warning("⚠️ Failed to parse LLM response: %s", e)
+            return None
+
+        return place, start_expr, end_expr
 
     def _format_weather_summary(self, weather_data: List[WeatherDay]) -> str:
         """Format weather data into a readable summary."""
@@ -214,11 +486,11 @@ class WeatherAgent:
             return (f"On {day.date}: High {day.max_temp}°C, Low {day.min_temp}°C, "
                    f"Precipitation {day.precipitation}mm, Wind {day.wind_speed}km/h")
         else:
-            summary = f"Weather forecast for {len(weather_data)} days:\n"
-            for day in weather_data:
-                summary += (f"• {day.date}: {day.max_temp}°C/{day.min_temp}°C, "
-                           f"{day.precipitation}mm rain, {day.wind_speed}km/h wind\n")
-            return summary.strip()
+            lines = [f"Weather forecast for {len(weather_data)} days:"]
+            lines.extend(f"• {day.date}: {day.max_temp}°C/{day.min_temp}°C, "
+                         f"{day.precipitation}mm rain, {day.wind_speed}km/h wind"
+                         for day in weather_data)
+            return "\n".join(lines)
 
     async def generate_natural_response(self, user_question: str, place: str, start_date: str, end_date: str, weather_summary: str) -> str:
         """Generate a natural language response using LLM."""
@@ -238,28 +510,33 @@ class WeatherAgent:
 
     async def process_weather_request(self, query: str) -> WeatherResponse:
         """Main method to process weather requests."""
-        logger.info(f"🌤️ Processing weather request: {query}")
+        logger.info("🌤️ Processing weather request: %s", query)
 
         try:
             # Find the appropriate tool
-            tool = next((t for t in self.tools if t.name == "parse_date_expression"), None)
+            tool = self.tools_by_name.get("parse_date_expression")
             if not tool:
                 raise ValueError("No suitable tool found for parsing query")
             
+            coord_tool = self.tools_by_name.get("get_coordinates")
+            if not coord_tool:
+                raise ValueError("No suitable tool found for getting coordinates")
+
             # Execute parse_date_expression tool
             place, start_date, end_date = await tool.execute(user_question=query)
-            logger.info(f"📍 Location: {place}, 📅 Date range: {start_date} to {end_date}")
+            logger.info("📍 Location: %s, 📅 Date range: %s to %s", place, start_date, end_date)
 
             # Execute get_coordinates tool
-            coord_tool = next((t for t in self.tools if t.name == "get_coordinates"), None)
-            if not coord_tool:
-                raise ValueError("No suitable tool found for getting coordinates")
             lat, lon = await coord_tool.execute(place=place)
 
             # Fetch weather data
             weather_data = await self.get_weather_data(lat, lon, start_date, end_date)
-            weather_summary = self._format_weather_summary(weather_data)
-            natural_summary = await self.generate_natural_response(query, place, start_date, end_date, weather_summary)
+            if self.llm_summary:
+                weather_summary = self._format_weather_summary(weather_data)
+                natural_summary = await self.generate_natural_response(query, place, start_date, end_date, weather_summary)
+            else:
+                # The per-day figures are already in weather_data, so don't repeat them here
+                natural_summary = f"Here's the weather forecast for {place} from {start_date} to {end_date}."
 
             response = WeatherResponse(
                 success=True,
@@ -277,7 +554,7 @@ class WeatherAgent:
         except HTTPException:
             raise
         except Exception as e:
-            logger.error(f"❌ Error processing weather request: {str(e)}")
+            logger.error("❌ Error processing weather request: %s", e)
             raise HTTPException(status_code=500, detail=f"Failed to process weather request: {str(e)}")
 
     async def list_tools(self) -> List[Dict[str, str]]:
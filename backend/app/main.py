@@ -1,6 +1,7 @@
 import logging
 import os
 from contextlib import asynccontextmanager
+import httpx
 from fastapi import FastAPI
 from app.agent.weather_agent import WeatherAgent
 from app.api.routes import router as api_router
@@ -11,6 +12,7 @@ logger = logging.getLogger(__name__)
 
 # Configuration
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+LLM_SUMMARY = os.getenv("LLM_SUMMARY", "true").lower() in ("1", "true", "yes")
 
 # Global agent instance
 weather_agent = None
@@ -21,13 +23,21 @@ async def lifespan(app: FastAPI):
     global weather_agent
     # Startup
     logger.info("🚀 Starting Weather Agent MCP Server")
-    weather_agent = WeatherAgent(GROQ_API_KEY)
+    # Shared HTTP client so outbound calls reuse pooled (HTTP/2) connections
+    http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        timeout=httpx.Timeout(30.0)
+    )
+    app.state.http = http_client
+    weather_agent = WeatherAgent(GROQ_API_KEY, http_client, llm_summary=LLM_SUMMARY)
     logger.info("✅ Weather Agent initialized")
     
     yield
     
     # Shutdown
     logger.info("🛑 Shutting down Weather Agent MCP Server")
+    await http_client.aclose()
 
 # FastAPI app
 app = FastAPI(
@@ -41,12 +51,16 @@ app = FastAPI(
 app.include_router(api_router)
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        # uvloop is not available on Windows (see requirements.txt marker)
+        loop="uvloop" if sys.platform != "win32" else "asyncio",
+        http="httptools",
+        workers=os.cpu_count(),
         log_level="info"
     ) 
 
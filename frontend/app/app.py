@@ -1,5 +1,6 @@
 import os
 import requests
+from requests.adapters import HTTPAdapter
 from dash import Dash, html, dcc, Input, Output, callback
 import logging
 
@@ -12,6 +13,12 @@ app = Dash(__name__, assets_folder='assets')
 
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
 
+# Shared session so repeat queries reuse pooled connections to the backend
+SESSION = requests.Session()
+SESSION.headers.update({"Content-Type": "application/json"})
+SESSION.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=20))
+SESSION.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20))
+
 # Layout
 app.layout = html.Div([
     html.H1("Weather Agent", className="header"),
@@ -38,9 +45,9 @@ def update_weather(n_clicks, query):
     if n_clicks == 0 or not query:
         return html.P("Enter a query and click 'Get Weather' to see the forecast.", className="info-text")
     
-    logger.info(f"Sending query to backend: {query}")
+    logger.info("Sending query to backend: %s", query)
     try:
-        response = requests.post(f"{BACKEND_URL}/weather", json={"query": query}, timeout=50)
+        response = SESSION.post(f"{BACKEND_URL}/weather", json={"query": query}, timeout=50)
         if response.status_code == 200:
             data = response.json()
             if data["success"]:
@@ -58,7 +65,7 @@ def update_weather(n_clicks, query):
         else:
             return html.P(f"Failed to fetch weather data, your request may not contain a valid location or date", className="error-text")
     except Exception as e:
-        logger.error(f"Error fetching weather: {str(e)}")
+        logger.error("Error fetching weather: %s", e)
         return html.P(f"Error: {str(e)}", className="error-text")
 
 if __name__ == "__main__":